@@ -12,13 +12,14 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+from concurrent.futures import ThreadPoolExecutor
+import json
 import os
-import re
-import shlex
-import subprocess
-import time
 
+from google.api_core.exceptions import Conflict
+from google.api_core.operation import Operation
 import google.auth
+from google.cloud import bigquery
 from google.cloud import storage
 from google.cloud.retail import (
     GcsSource,
@@ -43,45 +44,43 @@ events_dataset = "user_events"
 events_table = "events"
 events_schema = "../resources/events_schema.json"
 
-object_name = re.search("resources/(.*?)$", product_resource_file).group(1)
+object_name = os.path.basename(product_resource_file)
 default_catalog = f"projects/{project_id}/locations/global/catalogs/default_catalog/branches/default_branch"
+import_timeout = 30 * 60
 
 storage_client = storage.Client()
+bq_client = bigquery.Client(project=project_id)
+product_client = ProductServiceClient()
 
 
 def create_bucket(bucket_name: str) -> Bucket:
     """Create a new bucket in Cloud Storage"""
     print("Creating new bucket:" + bucket_name)
-    bucket_exists = check_if_bucket_exists(bucket_name)
-    if bucket_exists:
+    bucket = storage_client.bucket(bucket_name)
+    bucket.storage_class = "STANDARD"
+    try:
+        new_bucket = storage_client.create_bucket(bucket, location="us")
+    except Conflict:
         print(f"Bucket {bucket_name} already exists")
         return storage_client.bucket(bucket_name)
-    else:
-        bucket = storage_client.bucket(bucket_name)
-        bucket.storage_class = "STANDARD"
-        new_bucket = storage_client.create_bucket(bucket, location="us")
-        print(
-            f"Created bucket {new_bucket.name} in {new_bucket.location} with storage class {new_bucket.storage_class}"
-        )
-        return new_bucket
+    print(
+        f"Created bucket {new_bucket.name} in {new_bucket.location} with storage class {new_bucket.storage_class}"
+    )
+    return new_bucket
 
 
-def check_if_bucket_exists(new_bucket_name):
-    """Check if bucket is already exists"""
-    bucket_exists = False
-    buckets = storage_client.list_buckets()
-    for bucket in buckets:
-        if bucket.name == new_bucket_name:
-            bucket_exists = True
-            break
-    return bucket_exists
+def upload_data_to_bucket(bucket: Bucket, source_file: str):
+    """Upload data to a GCS bucket"""
+    blob = bucket.blob(os.path.basename(source_file))
+    blob.upload_from_filename(source_file)
+    print(f"Data from {source_file} has being uploaded to {bucket.name}")
 
 
-def upload_data_to_bucket(bucket: Bucket):
-    """Upload data to a GCS bucket"""
-    blob = bucket.blob(object_name)
-    blob.upload_from_filename(product_resource_file)
-    print(f"Data from {product_resource_file} has being uploaded to {bucket.name}")
+def setup_bucket(bucket_name: str, source_file: str) -> Bucket:
+    """Create a GCS bucket and upload the source file to it"""
+    bucket = create_bucket(bucket_name)
+    upload_data_to_bucket(bucket, source_file)
+    return bucket
 
 
 def get_import_products_gcs_request():
@@ -112,15 +111,19 @@ def get_import_products_gcs_request():
     return import_request
 
 
-def import_products_from_gcs():
+def import_products_from_gcs() -> Operation:
     """Call the Retail API to import products"""
     import_gcs_request = get_import_products_gcs_request()
-    gcs_operation = ProductServiceClient().import_products(import_gcs_request)
+    gcs_operation = product_client.import_products(import_gcs_request)
     print(f"Import operation is started: {gcs_operation.operation.name}")
+    return gcs_operation
+
 
-    while not gcs_operation.done():
-        print("Please wait till operation is completed")
-        time.sleep(30)
+def wait_for_import_products(gcs_operation: Operation):
+    """Wait till the import products operation is completed"""
+    print("Please wait till operation is completed")
+    # result() polls the operation with exponential backoff.
+    gcs_operation.result(timeout=import_timeout)
     print("Import products operation is completed")
 
     if gcs_operation.metadata is not None:
@@ -139,71 +142,98 @@ after that they will be available for search"
 
 def create_bq_dataset(dataset_name):
     """Create a BigQuery dataset"""
-    print(f"Creating dataset {dataset_name}")
-    try:
-        list_bq_dataset(project_id, dataset_name)
-        print(f"dataset {dataset_name} already exists")
-    except subprocess.CalledProcessError:
-        create_dataset_command = f'bq --location=US mk -d --default_table_expiration 3600 --description "This is my dataset." {project_id}:{dataset_name}'
-        subprocess.check_output(shlex.split(create_dataset_command))
-        print("dataset is created")
-
-
-def list_bq_dataset(project_id: str, dataset_name: str):
-    """List BigQuery dataset in the project"""
-    list_dataset_command = f"bq show {project_id}:{dataset_name}"
-    dataset_name = subprocess.check_output(shlex.split(list_dataset_command))
-    return str(dataset_name)
+    full_dataset_id = f"{project_id}.{dataset_name}"
+    print(f"Creating dataset {full_dataset_id}")
+    dataset = bigquery.Dataset(full_dataset_id)
+    dataset.location = "US"
+    dataset.default_table_expiration_ms = 3600 * 1000
+    dataset.description = "This is my dataset."
+    bq_client.create_dataset(dataset, exists_ok=True)
+    print(f"dataset {full_dataset_id} is ready")
 
 
-def create_bq_table(dataset, table_name, schema):
+def create_bq_table(dataset, table_name, schema_file_path):
     """Create a BigQuery table"""
-    print(f"Creating BigQuery table {table_name}")
-    if table_name not in list_bq_tables(dataset):
-        create_table_command = (
-            f"bq mk --table {project_id}:{dataset}.{table_name} {schema}"
-        )
-        output = subprocess.check_output(shlex.split(create_table_command))
-        print(output)
-        print("table is created")
-    else:
-        print(f"table {table_name} already exists")
+    full_table_id = f"{project_id}.{dataset}.{table_name}"
+    print(f"Creating BigQuery table {full_table_id}")
+    with open(schema_file_path, "rb") as schema:
+        schema_dict = json.load(schema)
+    table = bigquery.Table(full_table_id, schema=schema_dict)
+    bq_client.create_table(table, exists_ok=True)
+    print(f"table {full_table_id} is ready")
+
+
+def upload_data_to_bq_table(dataset, table_name, source_uri, schema_file_path):
+    """Upload data to the table from specified GCS source URI"""
+    full_table_id = f"{project_id}.{dataset}.{table_name}"
+    print(f"Uploading data from {source_uri} to the table {full_table_id}")
+    with open(schema_file_path, "rb") as schema:
+        schema_dict = json.load(schema)
+    job_config = bigquery.LoadJobConfig(
+        source_format=bigquery.SourceFormat.NEWLINE_DELIMITED_JSON, schema=schema_dict
+    )
+    job = bq_client.load_table_from_uri(
+        source_uri, full_table_id, job_config=job_config
+    )
+    job.result()  # Waits for the job to complete.
+    print("data was uploaded")
 
 
-def list_bq_tables(dataset):
-    """List BigQuery tables in the dataset"""
-    list_tables_command = f"bq ls {project_id}:{dataset}"
-    tables = subprocess.check_output(shlex.split(list_tables_command))
-    return str(tables)
+def setup_bq(dataset, table_name, schema):
+    """Create a BigQuery dataset and table"""
+    create_bq_dataset(dataset)
+    create_bq_table(dataset, table_name, schema)
 
 
-def upload_data_to_bq_table(dataset, table_name, source, schema):
-    """Upload data to the table from specified source file"""
-    print(f"Uploading data from {source} to the table {dataset}.{table_name}")
-    upload_data_command = f"bq load --source_format=NEWLINE_DELIMITED_JSON {project_id}:{dataset}.{table_name} {source} {schema}"
-    output = subprocess.check_output(shlex.split(upload_data_command))
-    print(output)
+def get_gcs_uri(bucket: Bucket, source_file: str) -> str:
+    """Get the GCS URI of the source file uploaded to the bucket"""
+    return f"gs://{bucket.name}/{os.path.basename(source_file)}"
 
 
-# Create a GCS bucket with products.json file
-created_products_bucket = create_bucket(products_bucket_name)
-upload_data_to_bucket(created_products_bucket)
+if __name__ == "__main__":
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        # Create GCS buckets with products.json and user_events.json files
+        products_bucket = executor.submit(
+            setup_bucket, products_bucket_name, product_resource_file
+        )
+        events_bucket = executor.submit(
+            setup_bucket, events_bucket_name, events_source_file
+        )
 
-# Create a GCS bucket with user_events.json file
-created_events_bucket = create_bucket(events_bucket_name)
-upload_data_to_bucket(created_events_bucket)
+        # Create BigQuery datasets and tables for products and user events
+        products_bq_setup = executor.submit(
+            setup_bq, product_dataset, product_table, product_schema
+        )
+        events_bq_setup = executor.submit(
+            setup_bq, events_dataset, events_table, events_schema
+        )
 
-# Import prodcuts from the GCS bucket to the Retail catalog
-import_products_from_gcs()
+        # Import prodcuts from the GCS bucket to the Retail catalog
+        products_source_uri = get_gcs_uri(
+            products_bucket.result(), product_resource_file
+        )
+        gcs_operation = import_products_from_gcs()
+
+        # Load the uploaded files to the BigQuery tables
+        products_bq_setup.result()
+        products_load = executor.submit(
+            upload_data_to_bq_table,
+            product_dataset,
+            product_table,
+            products_source_uri,
+            product_schema,
+        )
+        events_source_uri = get_gcs_uri(events_bucket.result(), events_source_file)
+        events_bq_setup.result()
+        events_load = executor.submit(
+            upload_data_to_bq_table,
+            events_dataset,
+            events_table,
+            events_source_uri,
+            events_schema,
+        )
 
-# Create a BigQuery table with products
-create_bq_dataset(product_dataset)
-create_bq_table(product_dataset, product_table, product_schema)
-upload_data_to_bq_table(
-    product_dataset, product_table, product_resource_file, product_schema
-)
+        for future in [products_load, events_load]:
+            future.result()
 
-# Create a BigQuery table with user events
-create_bq_dataset(events_dataset)
-create_bq_table(events_dataset, events_table, events_schema)
-upload_data_to_bq_table(events_dataset, events_table, events_source_file, events_schema)
+    wait_for_import_products(gcs_operation)
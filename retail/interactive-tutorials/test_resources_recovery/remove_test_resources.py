@@ -13,7 +13,6 @@
 # limitations under the License.
 
 import os
-import shlex
 import subprocess
 
 from google.api_core.exceptions import NotFound, PermissionDenied
@@ -37,6 +36,7 @@ events_dataset = "user_events"
 default_catalog = f"projects/{project_id}/locations/global/catalogs/default_catalog/branches/default_branch"
 
 storage_client = storage.Client()
+max_batch_size = 100
 
 
 def delete_bucket(bucket_name):
@@ -53,9 +53,14 @@ def delete_bucket(bucket_name):
 
 def delete_object_from_bucket(bucket: Bucket):
     """Delete object from bucket"""
-    blobs = bucket.list_blobs()
-    for blob in blobs:
-        blob.delete()
+    blobs = storage_client.list_blobs(bucket, page_size=max_batch_size)
+    for page in blobs.pages:
+        if page.num_items == 0:
+            continue
+        # Send the deletes for each page in a single batch request.
+        with storage_client.batch():
+            for blob in page:
+                blob.delete()
     print(f"all objects are deleted from GCS bucket {bucket.name}")
 
 
@@ -82,13 +87,14 @@ def delete_all_products():
 
 def delete_bq_dataset_with_tables(dataset):
     """Delete a BigQuery dataset with all tables"""
-    delete_dataset_command = f"bq rm -r -d -f {dataset}"
-    output = subprocess.check_output(shlex.split(delete_dataset_command))
+    delete_dataset_command = ["bq", "rm", "-r", "-d", "-f", dataset]
+    output = subprocess.check_output(delete_dataset_command)
     print(output)
 
 
-delete_bucket(product_bucket_name)
-delete_bucket(events_bucket_name)
-delete_all_products()
-delete_bq_dataset_with_tables(product_dataset)
-delete_bq_dataset_with_tables(events_dataset)
+if __name__ == "__main__":
+    delete_bucket(product_bucket_name)
+    delete_bucket(events_bucket_name)
+    delete_all_products()
+    delete_bq_dataset_with_tables(product_dataset)
+    delete_bq_dataset_with_tables(events_dataset)